@@ -1,26 +1,115 @@
-from fastapi import FastAPI, HTTPException, Depends, Header
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
-from pydantic import BaseModel
-from azure.cosmos import CosmosClient, exceptions
-from jose import jwt, JWTError
+from fastapi import FastAPI, HTTPException, Depends, Header, Path, Query, Request
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response
+from fastapi.staticfiles import StaticFiles
+from pydantic import BaseModel, ConfigDict, Field
+from azure.cosmos import exceptions
+from azure.cosmos.aio import CosmosClient
+import jwt
+from jwt import ExpiredSignatureError, InvalidSignatureError, InvalidTokenError
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import asyncio
+import base64
+import gzip
+import hashlib
+import hmac
+import math
+import orjson
 import os
+import re
+import time
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, NoReturn
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_cosmos()
+    app.state.cosmos = cosmos_pool
+    background_tasks = []
+    if cosmos_pool:
+        # Seeding, the cart id migration and health pings run in the background so the worker
+        # accepts requests right away.
+        background_tasks.append(asyncio.create_task(maybe_seed_products()))
+        background_tasks.append(asyncio.create_task(migrate_cart_ids()))
+        background_tasks.append(asyncio.create_task(monitor_db_health()))
+    yield
+    for task in background_tasks:
+        if not task.done():
+            task.cancel()
+    # let cancelled tasks unwind before their clients' sessions are closed
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    if cosmos_pool:
+        await cosmos_pool.close()
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (FastAPI's own ORJSONResponse is deprecated)."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
 
 # App branding
-app = FastAPI(title="BrewHaven Café API", version="1.0.0")
+app = FastAPI(
+    title="BrewHaven Café API",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
-BUILD_TIME = datetime.utcnow().isoformat()
+BUILD_TIME = datetime.now(timezone.utc).isoformat(timespec="seconds")
 
 # -------------------- CORS -------------------- #
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+_CORS_ALLOW_ORIGIN = (b"access-control-allow-origin", b"*")
+_CORS_PREFLIGHT_HEADERS = [
+    _CORS_ALLOW_ORIGIN,
+    (b"access-control-allow-methods", b"DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"),
+    (b"access-control-max-age", b"600"),
+]
+
+
+class AllowAllCORSMiddleware:
+    """
+    Minimal ASGI middleware for the allow-all CORS policy (any origin, method and header).
+    Answers preflight requests directly and stamps the allow-origin header on every
+    other HTTP response, without CORSMiddleware's per-request origin/method matching.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] == "OPTIONS":
+            request_headers = dict(scope["headers"])
+            if b"access-control-request-method" in request_headers:
+                allow_headers = request_headers.get(b"access-control-request-headers", b"*")
+                await send(
+                    {
+                        "type": "http.response.start",
+                        "status": 204,
+                        "headers": _CORS_PREFLIGHT_HEADERS
+                        + [(b"access-control-allow-headers", allow_headers)],
+                    }
+                )
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), _CORS_ALLOW_ORIGIN]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+
+app.add_middleware(AllowAllCORSMiddleware)
 
 # -------------------- Cosmos DB -------------------- #
 
@@ -28,45 +117,122 @@ COSMOS_ENDPOINT = os.environ.get("COSMOS_ENDPOINT", "")
 COSMOS_KEY = os.environ.get("COSMOS_KEY", "")
 DATABASE_NAME = "cloudmart"  # same DB name as before
 
-client = None
-database = None
-products_container = None
-cart_container = None
-orders_container = None
+# Optional per-client consistency. Cosmos rejects a level stronger than the
+# account's default, so this must be no stronger than that; unset means the
+# account default is used.
+COSMOS_CONSISTENCY_LEVEL = os.environ.get("COSMOS_CONSISTENCY_LEVEL", "")
+
+# Passed to every CosmosClient in the pool. The Python SDK only talks to the
+# gateway over HTTPS (there is no direct/TCP mode), and its default throttle
+# retries (9 attempts, 30s max wait) are kept.
+_COSMOS_CLIENT_OPTIONS = {
+    # writes never use the echoed document, so don't transfer it back
+    "no_response_on_write": True,
+}
+if COSMOS_CONSISTENCY_LEVEL:
+    _COSMOS_CLIENT_OPTIONS["consistency_level"] = COSMOS_CONSISTENCY_LEVEL
+
+
+class CosmosPool:
+    """
+    A small pool of async CosmosClients, each behind its own concurrency gate.
+    Requests are spread round-robin over the clients so that a burst does not
+    queue on a single client's connections. The health monitor's periodic
+    ping also goes round-robin, which keeps every client's connections warm.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        key: str,
+        database_name: str,
+        max_size: int = 4,
+        client_limit: int = 100,
+        **client_options,
+    ):
+        self._database_name = database_name
+        self._clients = [
+            CosmosClient(endpoint, key, **client_options) for _ in range(max_size)
+        ]
+        self._semaphores = [asyncio.Semaphore(client_limit) for _ in range(max_size)]
+        self._containers: list[dict] = [{} for _ in range(max_size)]
+        self._next = 0
+
+    @asynccontextmanager
+    async def _lease(self):
+        i = self._next
+        self._next = (i + 1) % len(self._clients)
+        async with self._semaphores[i]:
+            yield i
+
+    def _database(self, i: int):
+        return self._clients[i].get_database_client(self._database_name)
+
+    def _container(self, i: int, name: str):
+        container = self._containers[i].get(name)
+        if container is None:
+            container = self._database(i).get_container_client(name)
+            self._containers[i][name] = container
+        return container
+
+    @asynccontextmanager
+    async def get_database(self):
+        async with self._lease() as i:
+            yield self._database(i)
+
+    @asynccontextmanager
+    async def get_container(self, name: str):
+        async with self._lease() as i:
+            yield self._container(i, name)
+
+    @asynccontextmanager
+    async def get_containers(self, *names: str):
+        """Lease several containers from the same client under one concurrency slot."""
+        async with self._lease() as i:
+            yield tuple(self._container(i, name) for name in names)
+
+    async def close(self):
+        await asyncio.gather(*(c.close() for c in self._clients))
+
+
+cosmos_pool: CosmosPool | None = None
 
 
 def init_cosmos():
     """
-    Initialize Cosmos DB client and containers.
+    Initialize the Cosmos DB client pool shared by every request (stored on app.state.cosmos).
     If env vars are not set, the app still runs, but DB-dependent endpoints return empty data.
     """
-    global client, database, products_container, cart_container, orders_container
+    global cosmos_pool
 
     if not COSMOS_ENDPOINT or not COSMOS_KEY:
         # running without DB (local/dev mode)
         return
 
-    client = CosmosClient(COSMOS_ENDPOINT, COSMOS_KEY)
-    database = client.get_database_client(DATABASE_NAME)
-    products_container = database.get_container_client("products")
-    cart_container = database.get_container_client("cart")
-    orders_container = database.get_container_client("orders")
+    cosmos_pool = CosmosPool(
+        COSMOS_ENDPOINT, COSMOS_KEY, DATABASE_NAME, **_COSMOS_CLIENT_OPTIONS
+    )
+
 
-    # Seed data if necessary
+async def maybe_seed_products():
+    """Seed the menu if the products container is empty. Runs as a background task."""
     try:
-        items = list(
-            products_container.query_items(
-                "SELECT * FROM c", enable_cross_partition_query=True
-            )
-        )
-        if len(items) == 0:
-            seed_products()
+        # COUNT is answered server-side, so no product documents are transferred
+        count = 0
+        async with cosmos_pool.get_container("products") as products_container:
+            async for n in products_container.query_items(
+                _Q_COUNT_PRODUCTS, enable_cross_partition_query=True
+            ):
+                count = n
+                break
+        if count == 0:
+            await seed_products()
     except Exception:
         # if Cosmos is misconfigured, just skip seeding
         pass
 
 
-def seed_products():
+async def seed_products():
     """Seed BrewHaven coffee shop items into Cosmos DB 'products' container."""
     products = [
         {
@@ -187,16 +353,112 @@ def seed_products():
             "image": "🍫",
         },
     ]
+    by_category: dict[str, list[dict]] = {}
     for p in products:
-        try:
-            products_container.create_item(p)
-        except exceptions.CosmosResourceExistsError:
-            pass
+        by_category.setdefault(p["category"], []).append(p)
+
+    async with cosmos_pool.get_container("products") as products_container:
+        # Products are partitioned by /category, so each category can be written
+        # with one transactional batch instead of one request per item.
+        for category, group in by_category.items():
+            try:
+                await products_container.execute_item_batch(
+                    batch_operations=[("create", (p,)) for p in group],
+                    partition_key=category,
+                )
+            except exceptions.CosmosBatchOperationError:
+                # A batch is all-or-nothing (e.g. one item already exists);
+                # fall back to item-by-item creates for this category.
+                for p in group:
+                    try:
+                        await products_container.create_item(p)
+                    except exceptions.CosmosResourceExistsError:
+                        pass
+    invalidate_catalog_cache()
+
+
+async def migrate_cart_ids():
+    """
+    Move cart rows saved under random ids onto their deterministic ids
+    (see cart_item_id), so that add and remove can address them directly.
+    Runs once per worker as a background task.
+    """
+    try:
+        async with cosmos_pool.get_container("cart") as cart_container:
+            rows = []
+            async for row in cart_container.query_items(
+                _Q_CART, parameters=_USER_PARAMS, partition_key=DEFAULT_USER
+            ):
+                rows.append(row)
+            for row in rows:
+                product_id = row.get("product_id")
+                if (
+                    not isinstance(product_id, str)
+                    or len(product_id) > _PRODUCT_ID_MAX_LENGTH
+                    or not re.fullmatch(_PRODUCT_ID_PATTERN, product_id)
+                ):
+                    # cannot be addressed by a deterministic id; leave it
+                    continue
+                new_id = cart_item_id(product_id)
+                if row["id"] == new_id:
+                    continue
+                try:
+                    # create, not upsert: a row written since the read wins
+                    await cart_container.create_item(
+                        {
+                            "id": new_id,
+                            "user_id": DEFAULT_USER,
+                            "product_id": product_id,
+                            "quantity": row["quantity"],
+                        }
+                    )
+                except exceptions.CosmosResourceExistsError:
+                    pass
+                try:
+                    await cart_container.delete_item(row["id"], partition_key=DEFAULT_USER)
+                except exceptions.CosmosResourceNotFoundError:
+                    pass
+    except Exception:
+        # remove_from_cart still finds unmigrated rows by product
+        pass
 
 
-@app.on_event("startup")
-async def startup_event():
-    init_cosmos()
+# -------------------- HEALTH -------------------- #
+
+# /health is polled constantly, so the payload is serialized once and only
+# re-encoded when the background ping sees db_status change.
+_HEALTH_PING_INTERVAL = 10.0
+
+_HEALTH = {
+    "status": "healthy",
+    "service": "brewhaven-cafe-api",
+    "version": "1.0.0",
+    "build_time": BUILD_TIME,
+    "database": "cosmos-db",
+    "db_status": "disconnected",
+    "deployed_via": "aci-container",
+}
+_HEALTH_BYTES = orjson.dumps(_HEALTH)
+
+
+def set_db_status(db_status: str):
+    global _HEALTH_BYTES
+    if _HEALTH["db_status"] != db_status:
+        _HEALTH["db_status"] = db_status
+        _HEALTH_BYTES = orjson.dumps(_HEALTH)
+
+
+async def monitor_db_health():
+    """Ping Cosmos every _HEALTH_PING_INTERVAL seconds and record the result."""
+    while True:
+        try:
+            async with cosmos_pool.get_database() as database:
+                await database.read()
+            set_db_status("connected")
+        except Exception:
+            set_db_status("disconnected")
+        await asyncio.sleep(_HEALTH_PING_INTERVAL)
+
 
 # -------------------- JWT AUTH -------------------- #
 
@@ -205,1074 +467,471 @@ DEMO_PASSWORD = "coffee123"
 
 JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "brewhaven-dev-secret-key")
 JWT_ALGORITHM = "HS256"
+_SECRET_BYTES = JWT_SECRET_KEY.encode()
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
+_DEFAULT_EXPIRE_SECONDS = ACCESS_TOKEN_EXPIRE_MINUTES * 60
 
 
 class LoginRequest(BaseModel):
-    username: str
-    password: str
+    model_config = ConfigDict(extra="forbid", str_max_length=256, frozen=True)
+
+    username: Annotated[str, Field(min_length=1, max_length=64)]
+    password: Annotated[str, Field(min_length=1, max_length=64)]
 
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
-    to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+    lifetime = expires_delta.total_seconds() if expires_delta else _DEFAULT_EXPIRE_SECONDS
+    # exp is a NumericDate, so plain epoch arithmetic avoids building datetimes
+    to_encode = {**data, "exp": int(time.time() + lifetime)}
+    encoded_jwt = jwt.encode(to_encode, _SECRET_BYTES, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
 
-def get_current_user(authorization: str = Header(None)) -> str:
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Not authenticated")
-
-    token = authorization.split(" ", 1)[1]
-    try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=401, detail="Invalid token payload")
-        return username
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
-
-
-class CartItem(BaseModel):
-    product_id: str
-    quantity: int = 1
-
-
-DEFAULT_USER = "cafe_guest"
-
-# -------------------- HTML FRONTEND -------------------- #
-
-HTML_TEMPLATE = """<!DOCTYPE html>
-<html lang="en">
-<head>
-<meta charset="UTF-8">
-<title>BrewHaven Café – Coffee & Treats</title>
-<meta name="viewport" content="width=device-width, initial-scale=1.0">
-<style>
-* { box-sizing:border-box; margin:0; padding:0; }
-
-body {
-  font-family: system-ui, -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif;
-  min-height:100vh;
-  background:
-    radial-gradient(circle at top left, #f97316 0, transparent 55%),
-    radial-gradient(circle at bottom right, #a855f7 0, transparent 55%),
-    #1c1917;
-  color:#111827;
-}
-
-/* Top bar */
-.header {
-  position:sticky;
-  top:0;
-  z-index:10;
-  backdrop-filter: blur(16px);
-  background:rgba(28,25,23,0.88);
-  border-bottom:1px solid rgba(120,53,15,0.7);
-  color:#f5f5f4;
-  padding:14px 20px;
-}
-.header-content {
-  max-width:1120px;
-  margin:0 auto;
-  display:flex;
-  align-items:center;
-  justify-content:space-between;
-  gap:14px;
-}
-.logo {
-  display:flex;
-  flex-direction:column;
-  gap:2px;
-}
-.logo-main {
-  font-size:22px;
-  font-weight:800;
-  letter-spacing:0.12em;
-  text-transform:uppercase;
-}
-.logo-main span.cafe-name {
-  color:#fed7aa;
-}
-.logo-main span.dot {
-  color:#ea580c;
-}
-.logo-sub {
-  font-size:12px;
-  color:#e7e5e4;
-}
-.bean-badge {
-  margin-left:2px;
-  padding:3px 9px;
-  border-radius:999px;
-  font-size:11px;
-  background:rgba(68,64,60,0.8);
-  border:1px solid rgba(214,211,209,0.7);
-}
-
-/* Buttons */
-.btn,
-.cart-btn,
-.btn-outline {
-  font-size:13px;
-  border-radius:999px;
-  border:none;
-  cursor:pointer;
-  font-weight:500;
-  display:inline-flex;
-  align-items:center;
-  justify-content:center;
-  gap:6px;
-  transition:transform 0.08s ease, box-shadow 0.08s ease, background 0.12s ease;
-}
-.btn:active,
-.cart-btn:active,
-.btn-outline:active {
-  transform:translateY(1px);
-  box-shadow:none;
-}
-.btn-outline {
-  padding:7px 12px;
-  background:transparent;
-  border:1px solid rgba(214,211,209,0.8);
-  color:#f5f5f4;
-}
-.btn-outline:hover {
-  background:rgba(68,64,60,0.8);
-}
-.cart-btn {
-  background:linear-gradient(135deg,#f97316,#ea580c);
-  color:#1c1917;
-  padding:7px 14px;
-  box-shadow:0 10px 20px rgba(194,65,12,0.6);
-}
-.cart-btn:hover {
-  background:linear-gradient(135deg,#ea580c,#c2410c);
-}
-.cart-count {
-  background:#f5f5f4;
-  color:#c2410c;
-  border-radius:999px;
-  padding:1px 8px;
-  font-size:11px;
-  font-weight:700;
-}
-
-/* Main card */
-.main {
-  max-width:1120px;
-  margin:24px auto 40px;
-  padding:20px 18px 22px;
-  border-radius:22px;
-  background:radial-gradient(circle at top, rgba(250,250,249,0.12), transparent 55%) ,#1c1917;
-  box-shadow:
-    0 28px 70px rgba(15,23,42,0.85),
-    0 0 0 1px rgba(68,64,60,0.85);
-  color:#f5f5f4;
-}
-.main-header {
-  display:flex;
-  justify-content:space-between;
-  align-items:flex-end;
-  gap:16px;
-}
-.main-title h2 {
-  font-size:20px;
-  font-weight:600;
-}
-.main-title p {
-  margin-top:4px;
-  font-size:13px;
-  color:#e7e5e4;
-}
-.status-box {
-  font-size:11px;
-  color:#d6d3d1;
-  text-align:right;
-}
-small.build {
-  display:block;
-  margin-top:6px;
-  font-size:11px;
-  color:#a8a29e;
-}
-
-/* Filters */
-.chip-row {
-  display:flex;
-  flex-wrap:wrap;
-  gap:8px;
-  margin-top:16px;
-}
-.chip {
-  padding:6px 12px;
-  font-size:12px;
-  border-radius:999px;
-  border:1px solid rgba(120,53,15,0.8);
-  background:rgba(41,37,36,0.98);
-  color:#f5f5f4;
-  cursor:pointer;
-}
-.chip.active {
-  background:#fed7aa;
-  color:#431407;
-  border-color:transparent;
-}
-
-/* Search */
-.search-row {
-  margin-top:12px;
-}
-.search-input {
-  width:100%;
-  padding:8px 11px;
-  border-radius:11px;
-  border:1px solid rgba(87,83,78,0.9);
-  background:#0c0a09;
-  color:#f5f5f4;
-  font-size:13px;
-}
-
-/* Product grid */
-.product-grid {
-  display:grid;
-  grid-template-columns:repeat(auto-fit, minmax(220px, 1fr));
-  gap:16px;
-  margin-top:18px;
-}
-.card {
-  border-radius:18px;
-  padding:14px 14px 16px;
-  background:
-    radial-gradient(circle at top left, rgba(250,204,21,0.18), transparent 55%),
-    radial-gradient(circle at bottom right, rgba(248,250,252,0.08), transparent 55%),
-    #292524;
-  border:1px solid rgba(87,83,78,0.9);
-  box-shadow:0 18px 40px rgba(0,0,0,0.85);
-}
-.card-header {
-  display:flex;
-  justify-content:space-between;
-  align-items:center;
-}
-.emoji {
-  font-size:30px;
-}
-.badge {
-  font-size:11px;
-  padding:3px 9px;
-  border-radius:999px;
-  background:rgba(12,10,9,0.9);
-  color:#fed7aa;
-}
-.card-title {
-  margin-top:8px;
-  font-weight:600;
-  color:#fefce8;
-}
-.card-desc {
-  margin-top:6px;
-  font-size:13px;
-  color:#e7e5e4;
-}
-.card-footer {
-  margin-top:10px;
-  display:flex;
-  align-items:center;
-  justify-content:space-between;
-}
-.price {
-  font-weight:700;
-  color:#facc15;
-}
-.stock {
-  font-size:11px;
-  color:#a8a29e;
-}
-.btn-primary {
-  padding:6px 10px;
-  border-radius:999px;
-  border:none;
-  font-size:13px;
-  cursor:pointer;
-  font-weight:500;
-  background:linear-gradient(135deg,#f97316,#ea580c);
-  color:#1c1917;
-  box-shadow:0 10px 24px rgba(234,88,12,0.7);
-}
-.btn-primary:hover {
-  background:linear-gradient(135deg,#ea580c,#c2410c);
-}
-
-/* Modals */
-.modal-backdrop {
-  position:fixed;
-  inset:0;
-  background:rgba(12,10,9,0.82);
-  display:none;
-  align-items:flex-start;
-  justify-content:center;
-  padding-top:80px;
-  z-index:50;
-}
-.modal {
-  background:#0c0a09;
-  border-radius:18px;
-  padding:18px;
-  width:100%;
-  max-width:420px;
-  border:1px solid rgba(87,83,78,0.9);
-  box-shadow:0 24px 60px rgba(0,0,0,0.9);
-}
-.modal-header {
-  display:flex;
-  justify-content:space-between;
-  align-items:center;
-}
-.modal-header h3 {
-  color:#f5f5f4;
-  font-weight:600;
-}
-.close-btn {
-  width:22px;
-  height:22px;
-  border-radius:999px;
-  border:none;
-  background:#1c1917;
-  color:#f5f5f4;
-  cursor:pointer;
-}
-
-/* Cart table */
-.cart-head-row {
-  display:grid;
-  grid-template-columns:1fr auto auto auto;
-  font-size:12px;
-  color:#d6d3d1;
-  margin-top:12px;
-  padding-bottom:6px;
-  border-bottom:1px solid rgba(87,83,78,0.9);
-}
-.cart-items {
-  margin-top:10px;
-  max-height:300px;
-  overflow-y:auto;
-}
-.cart-item {
-  display:grid;
-  grid-template-columns:1fr auto auto auto;
-  align-items:center;
-  gap:12px;
-  padding:10px 0;
-  border-bottom:1px solid rgba(63,63,70,0.8);
-}
-.cart-product {
-  display:flex;
-  flex-direction:column;
-}
-.cart-item-price {
-  min-width:72px;
-  text-align:right;
-  color:#f5f5f4;
-}
-.cart-qty-controls {
-  display:flex;
-  align-items:center;
-  gap:6px;
-}
-.cart-item-qty {
-  min-width:20px;
-  text-align:center;
-  display:inline-block;
-}
-.qty-btn {
-  width:22px;
-  height:22px;
-  border-radius:999px;
-  border:none;
-  background:#1c1917;
-  color:#f5f5f4;
-  cursor:pointer;
-}
-.cart-total-row {
-  margin-top:10px;
-  display:flex;
-  justify-content:space-between;
-  font-weight:600;
-}
-.cart-total-row span {
-  color:#fef9c3;
-}
-#cartTotal {
-  color:#facc15;
-}
-
-/* Toast */
-.toast {
-  position:fixed;
-  bottom:18px;
-  right:18px;
-  padding:10px 14px;
-  border-radius:10px;
-  background:#22c55e;
-  color:#052e16;
-  font-size:13px;
-  display:none;
-  z-index:60;
-}
-.toast.error {
-  background:#f97373;
-  color:#450a0a;
-}
-
-/* Login form */
-.login-note {
-  margin-top:8px;
-  font-size:11px;
-  color:#a8a29e;
-}
-.input-field {
-  width:100%;
-  margin-top:4px;
-  padding:6px 8px;
-  border-radius:9px;
-  border:1px solid rgba(87,83,78,0.9);
-  background:#0c0a09;
-  color:#f5f5f4;
-  font-size:13px;
-}
-.label {
-  font-size:12px;
-  color:#d6d3d1;
-}
-</style>
-</head>
-<body>
-<header class="header">
-  <div class="header-content">
-    <div class="logo">
-      <div class="logo-main">
-        <span class="cafe-name">BREWHAVEN</span><span class="dot">·CAFÉ</span>
-        <span class="bean-badge">☕ Single-origin & fresh pastry</span>
-      </div>
-      <div class="logo-sub">Warm drinks, sweet bites, and a cloud-backed checkout.</div>
-    </div>
-    <div style="display:flex;align-items:center;gap:8px;">
-      <button class="btn-outline" id="loginBtn" onclick="openLogin()">Login</button>
-      <button class="cart-btn" onclick="openCart()">🧺 Basket <span id="cartCount" class="cart-count">0</span></button>
-    </div>
-  </div>
-</header>
-
-<main class="main">
-  <div class="main-header">
-    <div class="main-title">
-      <h2>Menu</h2>
-      <p>Browse handcrafted coffees, pastries, and desserts – add to your basket and confirm your order.</p>
-    </div>
-    <div class="status-box">
-      <div id="healthStatus">Checking café systems…</div>
-      <small class="build">Build timestamp: <span id="buildTime"></span></small>
-    </div>
-  </div>
-
-  <div class="chip-row" id="categoryChips"></div>
-
-  <div class="search-row">
-    <input id="searchBox" class="search-input" type="text"
-      placeholder="Search by drink, pastry, or category…"
-      oninput="searchProducts()" />
-  </div>
-
-  <div class="product-grid" id="productGrid"></div>
-</main>
-
-<!-- CART MODAL -->
-<div class="modal-backdrop" id="cartModal">
-  <div class="modal">
-    <div class="modal-header">
-      <h3>Your Basket</h3>
-      <button class="close-btn" onclick="closeCart()">✕</button>
-    </div>
-
-    <div class="cart-head-row">
-      <span>Item</span>
-      <span>Qty</span>
-      <span>Total</span>
-      <span></span>
-    </div>
-
-    <div class="cart-items" id="cartItems"></div>
-
-    <div class="cart-total-row">
-      <span>Order total</span>
-      <span id="cartTotal">$0.00</span>
-    </div>
-
-    <div style="margin-top:12px;display:flex;justify-content:flex-end;gap:8px;">
-      <button class="btn" onclick="closeCart()">Close</button>
-      <button class="btn btn-primary" onclick="placeOrder()">Place order</button>
-    </div>
-  </div>
-</div>
-
-<!-- LOGIN MODAL -->
-<div class="modal-backdrop" id="loginModal">
-  <div class="modal">
-    <div class="modal-header">
-      <h3>Barista Login</h3>
-      <button class="close-btn" onclick="closeLogin()">✕</button>
-    </div>
-    <form onsubmit="performLogin(event)" style="margin-top:12px;display:flex;flex-direction:column;gap:8px;">
-      <div>
-        <label class="label">Username</label>
-        <input id="loginUsername" type="text" value="barista" class="input-field">
-      </div>
-      <div>
-        <label class="label">Password</label>
-        <input id="loginPassword" type="password" value="coffee123" class="input-field">
-      </div>
-      <div style="margin-top:10px;display:flex;justify-content:flex-end;gap:8px;">
-        <button type="button" class="btn" onclick="closeLogin()">Cancel</button>
-        <button type="submit" class="btn btn-primary">Login</button>
-      </div>
-    </form>
-    <p class="login-note">Demo credentials: barista / coffee123</p>
-  </div>
-</div>
-
-<div class="toast" id="toast"></div>
-
-<script>
-let products = [];
-let categories = [];
-let cart = [];
-let authToken = null;
-
-async function fetchJSON(url, options) {
-  const opts = options || {};
-  opts.headers = opts.headers || {};
-
-  if (authToken) {
-    opts.headers["Authorization"] = "Bearer " + authToken;
-  }
-
-  const res = await fetch(url, opts);
-  if (!res.ok) {
-    throw new Error("HTTP " + res.status);
-  }
-  return res.json();
-}
+# Every token minted by create_access_token carries this exact header, so its
+# base64url segment is a constant and such tokens can be verified without going
+# through jwt.decode: one HMAC from a keyed prototype, compare, parse the payload.
+_HS256_HEADER_SEGMENT = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b"=").decode()
+_HMAC_PROTO = hmac.new(_SECRET_BYTES, digestmod=hashlib.sha256)
 
-async function loadHealth() {
-  try {
-    const data = await fetchJSON("/health");
-    document.getElementById("healthStatus").textContent =
-      data.status === "healthy"
-        ? "Status: brewing fine (" + data.db_status + ")"
-        : "Status: " + data.status;
-    document.getElementById("buildTime").textContent = data.build_time || "";
-  } catch (e) {
-    document.getElementById("healthStatus").textContent = "Status: unreachable";
-  }
-}
 
-function updateAuthUI() {
-  const btn = document.getElementById("loginBtn");
-  if (!btn) return;
-  if (authToken) {
-    btn.textContent = "Logout";
-  } else {
-    btn.textContent = "Login";
-  }
-}
+def _b64url_decode(segment: str) -> bytes:
+    decoded = base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+    # Only the canonical unpadded encoding is accepted, so junk characters or
+    # stray bits (which jwt.decode rejects) never reach the fast path.
+    if base64.urlsafe_b64encode(decoded).rstrip(b"=").decode() != segment:
+        raise ValueError("non-canonical base64url segment")
+    return decoded
 
-async function init() {
-  authToken = localStorage.getItem("brewhaven_token") || null;
-  updateAuthUI();
-
-  await loadHealth();
-  try {
-    products = await fetchJSON("/api/v1/products");
-    categories = await fetchJSON("/api/v1/categories");
-    if (authToken) {
-      try {
-        cart = await fetchJSON("/api/v1/cart");
-      } catch (e) {
-        cart = [];
-      }
-    } else {
-      cart = [];
-    }
-  } catch (e) {
-    showToast("Failed to load menu from API", true);
-  }
-  renderCategories();
-  renderProducts();
-  updateCartCount();
-}
 
-function renderCategories() {
-  const container = document.getElementById("categoryChips");
-  container.innerHTML = "";
-  const allChip = document.createElement("button");
-  allChip.className = "chip active";
-  allChip.textContent = "All items";
-  allChip.onclick = () => filterCategory(null);
-  container.appendChild(allChip);
-
-  categories.forEach(cat => {
-    const chip = document.createElement("button");
-    chip.className = "chip";
-    chip.textContent = cat;
-    chip.onclick = () => filterCategory(cat);
-    container.appendChild(chip);
-  });
-}
+# The only claim set create_access_token mints; anything else (nbf, iat, aud,
+# ...) needs the full checks in jwt.decode.
+_FAST_PATH_CLAIMS = frozenset(("sub", "exp"))
 
-function renderProducts(filtered) {
-  const grid = document.getElementById("productGrid");
-  grid.innerHTML = "";
-  const list = filtered || products;
-
-  list.forEach(p => {
-    const card = document.createElement("article");
-    card.className = "card";
-
-    card.innerHTML = `
-      <div class="card-header">
-        <div class="emoji">${p.image || "☕"}</div>
-        <span class="badge">${p.category}</span>
-      </div>
-      <div class="card-title">${p.name}</div>
-      <div class="card-desc">${p.description}</div>
-      <div class="card-footer">
-        <div>
-          <div class="price">$${Number(p.price).toFixed(2)}</div>
-          <div class="stock">${p.stock} available</div>
-        </div>
-        <button class="btn-primary" data-id="${p.id}">Add to basket</button>
-      </div>
-    `;
-
-    const btn = card.querySelector("button");
-    btn.onclick = () => addToCart(p.id, 1);
-
-    grid.appendChild(card);
-  });
-}
 
-function filterCategory(category) {
-  const chips = document.querySelectorAll(".chip");
-  chips.forEach(c => c.classList.remove("active"));
-  if (!category) {
-    chips[0].classList.add("active");
-    renderProducts();
-    return;
-  }
-  chips.forEach(c => {
-    if (c.textContent === category) c.classList.add("active");
-  });
-  renderProducts(products.filter(p => p.category === category));
-}
+def _decode_with_pyjwt(token: str) -> dict:
+    return jwt.decode(
+        token,
+        _SECRET_BYTES,
+        algorithms=[JWT_ALGORITHM],
+        options={"require": ["exp", "sub"]},
+    )
 
-async function searchProducts() {
-  const box = document.getElementById("searchBox");
-  if (!box) return;
-  const q = box.value.trim();
-
-  if (q.length === 0) {
-    const activeChip = document.querySelector(".chip.active");
-    if (!activeChip || activeChip.textContent === "All items") {
-      renderProducts();
-    } else {
-      const cat = activeChip.textContent;
-      renderProducts(products.filter(p => p.category === cat));
-    }
-    return;
-  }
-
-  try {
-    const results = await fetchJSON("/api/v1/search?q=" + encodeURIComponent(q));
-    renderProducts(results);
-  } catch (e) {
-    showToast("Search failed", true);
-  }
-}
 
-function updateCartCount() {
-  document.getElementById("cartCount").textContent = cart.length;
-}
+def decode_access_token(token: str) -> dict:
+    """
+    Verify a token and return its claims. Raises InvalidTokenError (or a subclass).
+    Tokens with any other header, or claims other than a string sub and an
+    integer exp, fall back to jwt.decode.
+    """
+    header, _, rest = token.partition(".")
+    if header != _HS256_HEADER_SEGMENT:
+        return _decode_with_pyjwt(token)
+
+    # Anything malformed goes to jwt.decode so it raises its own error.
+    payload, _, signature = rest.partition(".")
+    if not payload or not signature or "." in signature:
+        return _decode_with_pyjwt(token)
+    try:
+        payload_bytes = _b64url_decode(payload)
+        expected = _b64url_decode(signature)
+    except ValueError:
+        return _decode_with_pyjwt(token)
 
-function requireLogin() {
-  showToast("Login to manage basket and orders", true);
-  openLogin();
-}
+    mac = _HMAC_PROTO.copy()
+    mac.update(f"{header}.{payload}".encode())
+    if not hmac.compare_digest(mac.digest(), expected):
+        raise InvalidSignatureError("Signature verification failed")
 
-function openCart() {
-  if (!authToken) {
-    requireLogin();
-    return;
-  }
-  renderCart();
-  document.getElementById("cartModal").style.display = "flex";
-}
+    try:
+        claims = orjson.loads(payload_bytes)
+    except ValueError:
+        return _decode_with_pyjwt(token)
+    if (
+        not isinstance(claims, dict)
+        or claims.keys() != _FAST_PATH_CLAIMS
+        or not isinstance(claims["sub"], str)
+        or type(claims["exp"]) is not int
+    ):
+        return _decode_with_pyjwt(token)
+    if claims["exp"] <= time.time():
+        raise ExpiredSignatureError("Signature has expired")
+    return claims
+
+
+# Verified tokens are cached briefly so repeat requests skip verification.
+# The short TTL bounds how long a token is trusted without re-verification.
+_JWT_CACHE_TTL = 5.0
+_JWT_CACHE_MAX_ENTRIES = 10_000
+
+# sha256(token) -> (claims, cached_at)
+# Only touched from the event loop (the dependency is async), so no lock is needed.
+_jwt_cache: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()
+
+
+async def get_current_user(authorization: str = Header(None)) -> str:
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Not authenticated")
 
-function closeCart() {
-  document.getElementById("cartModal").style.display = "none";
-}
+    token = authorization.split(" ", 1)[1]
+    key = hashlib.sha256(token.encode()).digest()
 
-function renderCart() {
-  const container = document.getElementById("cartItems");
-  container.innerHTML = "";
+    entry = _jwt_cache.get(key)
+    if entry is not None:
+        claims, cached_at = entry
+        if time.monotonic() - cached_at < _JWT_CACHE_TTL and claims["exp"] > time.time():
+            _jwt_cache.move_to_end(key)
+            return claims["sub"]
+        del _jwt_cache[key]
 
-  if (!cart || cart.length === 0) {
-    container.innerHTML = '<p style="color:#d6d3d1;font-size:13px;">Your basket is empty.</p>';
-    document.getElementById("cartTotal").innerText = "$0.00";
-    return;
-  }
+    try:
+        payload = decode_access_token(token)
+    except InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
 
-  let total = 0;
+    _jwt_cache[key] = (payload, time.monotonic())
+    if len(_jwt_cache) > _JWT_CACHE_MAX_ENTRIES:
+        _jwt_cache.popitem(last=False)
+    return payload["sub"]
 
-  cart.forEach(item => {
-    const price = Number(item.price) || 0;
-    const qty = Number(item.quantity) || 0;
-    const lineTotal = price * qty;
-    total += lineTotal;
 
-    const row = document.createElement("div");
-    row.className = "cart-item";
+# Product ids become part of cart document ids, so they are limited to
+# characters Cosmos allows in an id (it rejects / \\ ? # and ids over 255 chars).
+_PRODUCT_ID_PATTERN = r"^[A-Za-z0-9_-]+$"
+_PRODUCT_ID_MAX_LENGTH = 64
 
-    row.innerHTML = `
-      <div class="cart-product">
-        <div>${item.name}</div>
-        <div style="font-size:12px;color:#a8a29e;">$${price.toFixed(2)} each</div>
-      </div>
 
-      <div class="cart-qty-controls">
-        <button class="qty-btn dec">-</button>
-        <span class="cart-item-qty">${qty}</span>
-        <button class="qty-btn inc">+</button>
-      </div>
+class CartItem(BaseModel):
+    model_config = ConfigDict(extra="forbid", str_max_length=256, frozen=True)
 
-      <div class="cart-item-price">$${lineTotal.toFixed(2)}</div>
+    product_id: Annotated[
+        str,
+        Field(min_length=1, max_length=_PRODUCT_ID_MAX_LENGTH, pattern=_PRODUCT_ID_PATTERN),
+    ]
+    quantity: int = 1
 
-      <button class="qty-btn remove-btn">✕</button>
-    `;
 
-    row.querySelector(".dec").onclick = () => {
-      if (qty <= 1) {
-        removeFromCart(item.id);
-      } else {
-        updateCartQuantity(item.id, qty - 1);
-      }
-    };
+DEFAULT_USER = "cafe_guest"
 
-    row.querySelector(".inc").onclick = () => {
-      updateCartQuantity(item.id, qty + 1);
-    };
+# -------------------- QUERIES -------------------- #
+
+# SQL text and the fixed parameter list are built once at import time and
+# shared by every request.
+_Q_COUNT_PRODUCTS = "SELECT VALUE COUNT(1) FROM c"
+_Q_ALL_PRODUCTS = "SELECT * FROM c"
+# CONTAINS(..., true) matches case-insensitively on the server, so
+# "latte" finds "Café Latte" without storing lowercased copies.
+_Q_SEARCH_PRODUCTS = (
+    "SELECT * FROM c "
+    "WHERE CONTAINS(c.name, @q, true) "
+    "OR CONTAINS(c.category, @q, true)"
+)
+_Q_CART = "SELECT c.id, c.product_id, c.quantity FROM c WHERE c.user_id = @user_id"
+_Q_CART_PRODUCT_IDS = (
+    "SELECT c.id FROM c WHERE c.user_id = @user_id AND c.product_id = @product_id"
+)
+_Q_ORDERS = (
+    "SELECT c.id, c.items, c.status, c.created_at FROM c "
+    "WHERE c.user_id = @user_id ORDER BY c.created_at DESC"
+)
+_USER_PARAMS = ({"name": "@user_id", "value": DEFAULT_USER},)
 
-    row.querySelector(".remove-btn").onclick = () => {
-      removeFromCart(item.id);
-    };
+# Carts hold a handful of rows; one small page covers a typical cart.
+_CART_PAGE_SIZE = 16
 
-    container.appendChild(row);
-  });
+# -------------------- HTML FRONTEND -------------------- #
 
-  document.getElementById("cartTotal").innerText = `$${total.toFixed(2)}`;
-}
+# The page lives in static/index.html and is served from disk. Clients that
+# accept gzip get a copy that is minified (indentation and blank lines stripped;
+# newlines stay so the inline JS keeps its statement boundaries) and compressed
+# once at import.
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+INDEX_HTML = os.path.join(STATIC_DIR, "index.html")
+
+with open(INDEX_HTML, encoding="utf-8") as f:
+    _HTML_GZ = gzip.compress(
+        "\n".join(line.strip() for line in f if line.strip()).encode("utf-8"),
+        compresslevel=9,
+    )
+
+_HTML_RESPONSE_HEADERS = {
+    "cache-control": "public, max-age=300",
+    "vary": "accept-encoding",
+}
+_HTML_GZ_RESPONSE_HEADERS = {
+    "content-length": str(len(_HTML_GZ)),
+    "content-encoding": "gzip",
+    "cache-control": "public, max-age=300",
+    "vary": "accept-encoding",
+}
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """True if an Accept-Encoding header allows gzip (honours q=0 and "*")."""
+    wildcard = False
+    for token in accept_encoding.split(","):
+        coding, *params = token.split(";")
+        coding = coding.strip().lower()
+        if coding not in ("gzip", "*"):
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding == "gzip":
+            # an explicit gzip entry wins over the wildcard
+            return q > 0
+        wildcard = q > 0
+    return wildcard
+
+
+app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+
+
+# -------------------- CATALOG CACHE -------------------- #
+
+# The menu rarely changes, so /products, /categories and the cart's product
+# details are served from memory and only refreshed from Cosmos once the entry
+# is older than _CACHE_TTL seconds.
+_CACHE_TTL = 30.0
+
+# Results are consumed page by page as the SDK fetches them; this bounds each page.
+_QUERY_PAGE_SIZE = 100
+
+# (fetched_at, items, pre-serialized JSON body, items keyed by id)
+_products_cache: tuple[float, list, bytes, dict] | None = None
+# (fetched_at, categories, pre-serialized JSON body), derived from the products
+_categories_cache: tuple[float, list, bytes] | None = None
+# product id -> pre-serialized JSON body, filled on first lookup; only ids in
+# the cached menu are stored, so it is bounded by the menu size
+_product_bodies: dict[str, bytes] = {}
+
+# Only one request refills an expired cache; the rest wait and reuse its result.
+_catalog_lock = asyncio.Lock()
+
+
+def invalidate_catalog_cache():
+    """Drop cached catalog data so the next read goes back to Cosmos."""
+    global _products_cache, _categories_cache
+    _products_cache = None
+    _categories_cache = None
+    _product_bodies.clear()
+    _search_cache.clear()
+
+
+async def get_cached_products() -> tuple[float, list, bytes, dict]:
+    global _products_cache, _categories_cache
+    if _products_cache and time.monotonic() - _products_cache[0] < _CACHE_TTL:
+        return _products_cache
+
+    async with _catalog_lock:
+        # another request may have refilled the cache while this one waited
+        if _products_cache and time.monotonic() - _products_cache[0] < _CACHE_TTL:
+            return _products_cache
+
+        items: list = []
+        items_append = items.append
+        async with cosmos_pool.get_container("products") as products_container:
+            async for item in products_container.query_items(
+                _Q_ALL_PRODUCTS,
+                enable_cross_partition_query=True,
+                max_item_count=_QUERY_PAGE_SIZE,
+            ):
+                items_append(item)
+
+        fetched_at = time.monotonic()
+        # categories in menu order, so the filter chips keep a stable layout
+        categories = list(dict.fromkeys(p["category"] for p in items))
+        _categories_cache = (fetched_at, categories, orjson.dumps(categories))
+        _product_bodies.clear()
+        _products_cache = (
+            fetched_at,
+            items,
+            orjson.dumps(items),
+            {p["id"]: p for p in items},
+        )
+        return _products_cache
 
-async function addToCart(productId, quantity) {
-  if (!authToken) {
-    requireLogin();
-    return;
-  }
-  try {
-    await fetchJSON("/api/v1/cart/items", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ product_id: productId, quantity }),
-    });
-    cart = await fetchJSON("/api/v1/cart");
-    updateCartCount();
-    showToast("Item added to basket");
-  } catch (e) {
-    showToast("Failed to update basket", true);
-  }
-}
 
-async function updateCartQuantity(productId, quantity) {
-  if (!authToken) {
-    requireLogin();
-    return;
-  }
-  await addToCart(productId, quantity);
-  renderCart();
-}
+async def get_cached_categories() -> tuple[float, list, bytes]:
+    await get_cached_products()
+    return _categories_cache
 
-async function removeFromCart(productId) {
-  if (!authToken) {
-    requireLogin();
-    return;
-  }
-  try {
-    await fetchJSON("/api/v1/cart/items/" + productId, {
-      method: "DELETE",
-    });
-    cart = await fetchJSON("/api/v1/cart");
-    updateCartCount();
-    renderCart();
-    showToast("Item removed");
-  } catch (e) {
-    showToast("Failed to remove item", true);
-  }
-}
 
-async function placeOrder() {
-  if (!authToken) {
-    requireLogin();
-    return;
-  }
-  if (cart.length === 0) {
-    showToast("Basket is empty", true);
-    return;
-  }
-  try {
-    const order = await fetchJSON("/api/v1/orders", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: "{}",
-    });
-    cart = [];
-    updateCartCount();
-    closeCart();
-    showToast("Order placed – enjoy your treats!");
-    console.log("Order:", order);
-  } catch (e) {
-    showToast("Failed to place order", true);
-  }
-}
+# The search box queries on every keystroke, so recent results are kept per
+# normalized query string for a few seconds.
+_SEARCH_CACHE_TTL = 10.0
+_SEARCH_CACHE_MAX_ENTRIES = 256
 
-function openLogin() {
-  if (authToken) {
-    authToken = null;
-    localStorage.removeItem("brewhaven_token");
-    cart = [];
-    updateCartCount();
-    updateAuthUI();
-    showToast("Logged out");
-    return;
-  }
-  document.getElementById("loginModal").style.display = "flex";
-}
+# q -> (fetched_at, pre-serialized JSON body)
+_search_cache: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
 
-function closeLogin() {
-  document.getElementById("loginModal").style.display = "none";
-}
 
-async function performLogin(event) {
-  event.preventDefault();
-  const u = document.getElementById("loginUsername").value.trim();
-  const p = document.getElementById("loginPassword").value.trim();
-
-  if (!u || !p) {
-    showToast("Enter username and password", true);
-    return;
-  }
-
-  try {
-    const res = await fetch("/auth/login", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ username: u, password: p }),
-    });
-
-    if (!res.ok) {
-      showToast("Invalid credentials", true);
-      return;
-    }
-
-    const data = await res.json();
-    authToken = data.access_token;
-    localStorage.setItem("brewhaven_token", authToken);
-    updateAuthUI();
-    closeLogin();
-
-    try {
-      cart = await fetchJSON("/api/v1/cart");
-      updateCartCount();
-    } catch (e) {
-      cart = [];
-    }
-
-    showToast("Logged in");
-  } catch (e) {
-    showToast("Sign-in failed", true);
-  }
-}
+# -------------------- ERRORS -------------------- #
 
-let toastTimeout;
-function showToast(message, isError) {
-  const t = document.getElementById("toast");
-  t.textContent = message;
-  t.classList.toggle("error", !!isError);
-  t.style.display = "block";
-  clearTimeout(toastTimeout);
-  toastTimeout = setTimeout(() => (t.style.display = "none"), 3000);
-}
+def raise_http_error(e: exceptions.CosmosHttpResponseError) -> NoReturn:
+    """
+    Surface the Cosmos errors a client can act on: throttling that outlasted the
+    SDK's own retries becomes a 429 with Retry-After, and a missing database or
+    container (handlers that look up a single document catch NotFound
+    themselves) becomes a 503. Anything else is re-raised and ends up as a 500.
+    """
+    if isinstance(e, exceptions.CosmosResourceNotFoundError):
+        raise HTTPException(status_code=503, detail="Database not available") from e
+    if e.status_code == 429:
+        retry_after_ms = float((e.headers or {}).get("x-ms-retry-after-ms") or 1000)
+        raise HTTPException(
+            status_code=429,
+            detail="Database is busy, try again shortly",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after_ms / 1000)))},
+        ) from e
+    raise e
 
-init();
-</script>
-</body>
-</html>
-"""
 
 # -------------------- ROUTES -------------------- #
 
 @app.get("/", response_class=HTMLResponse)
-def home():
-    return HTML_TEMPLATE
+async def home(request: Request):
+    if accepts_gzip(request.headers.get("accept-encoding", "")):
+        return Response(
+            content=_HTML_GZ,
+            media_type="text/html; charset=utf-8",
+            headers=_HTML_GZ_RESPONSE_HEADERS,
+        )
+    return FileResponse(
+        INDEX_HTML,
+        media_type="text/html; charset=utf-8",
+        headers=_HTML_RESPONSE_HEADERS,
+    )
 
 
 @app.get("/health")
-def health():
-    db_status = "connected" if client else "disconnected"
-    return {
-        "status": "healthy",
-        "service": "brewhaven-cafe-api",
-        "version": "1.0.0",
-        "build_time": BUILD_TIME,
-        "database": "cosmos-db",
-        "db_status": db_status,
-        "deployed_via": "aci-container",
-    }
+async def health():
+    return Response(content=_HEALTH_BYTES, media_type="application/json")
 
 
 @app.post("/auth/login")
-def auth_login(body: LoginRequest):
+async def auth_login(body: LoginRequest):
     if body.username != DEMO_USERNAME or body.password != DEMO_PASSWORD:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     token = create_access_token({"sub": body.username})
-    return {"access_token": token, "token_type": "bearer"}
+    return ORJSONResponse(content={"access_token": token, "token_type": "bearer"})
 
 
 @app.get("/api/v1/products")
-def list_products(category: str | None = None):
-    if not products_container:
+async def list_products(category: str | None = None):
+    if not cosmos_pool:
         # running without DB
         return []
     try:
-        if category:
-            query = "SELECT * FROM c WHERE c.category = @category"
-            items = list(
-                products_container.query_items(
-                    query,
-                    parameters=[{"name": "@category", "value": category}],
-                    enable_cross_partition_query=True,
-                )
-            )
-        else:
-            items = list(
-                products_container.query_items(
-                    "SELECT * FROM c", enable_cross_partition_query=True
-                )
-            )
-        return items
-    except Exception:
-        return []
+        _, items, body, _ = await get_cached_products()
+    except exceptions.CosmosHttpResponseError as e:
+        raise_http_error(e)
+    if category:
+        # 13-item menu: filtering the cached list beats another Cosmos query
+        return ORJSONResponse(content=[p for p in items if p.get("category") == category])
+    return Response(content=body, media_type="application/json")
 
 
 @app.get("/api/v1/search")
-def search_products(q: str):
+async def search_products(q: str):
     """
-    Simple search endpoint: searches in product name and category.
+    Simple search endpoint: case-insensitive match on product name and category.
     """
-    if not products_container:
+    if not cosmos_pool:
         return []
+    q = q.strip().lower()
+
+    entry = _search_cache.get(q)
+    if entry is not None and time.monotonic() - entry[0] < _SEARCH_CACHE_TTL:
+        _search_cache.move_to_end(q)
+        return Response(content=entry[1], media_type="application/json")
+
     try:
-        query = (
-            "SELECT * FROM c "
-            "WHERE CONTAINS(c.name, @q) "
-            "OR CONTAINS(c.category, @q)"
-        )
-        items = list(
-            products_container.query_items(
-                query,
+        items: list = []
+        items_append = items.append
+        async with cosmos_pool.get_container("products") as products_container:
+            async for item in products_container.query_items(
+                _Q_SEARCH_PRODUCTS,
                 parameters=[{"name": "@q", "value": q}],
                 enable_cross_partition_query=True,
-            )
-        )
-        return items
-    except Exception:
-        return []
+                max_item_count=_QUERY_PAGE_SIZE,
+            ):
+                items_append(item)
+    except exceptions.CosmosHttpResponseError as e:
+        raise_http_error(e)
+
+    body = orjson.dumps(items)
+    _search_cache[q] = (time.monotonic(), body)
+    _search_cache.move_to_end(q)
+    if len(_search_cache) > _SEARCH_CACHE_MAX_ENTRIES:
+        _search_cache.popitem(last=False)
+    return Response(content=body, media_type="application/json")
 
 
 @app.get("/api/v1/products/{product_id}")
-def get_product(product_id: str):
-    if not products_container:
+async def get_product(product_id: str):
+    if not cosmos_pool:
         raise HTTPException(status_code=503, detail="Database not available")
     try:
-        items = list(
-            products_container.query_items(
-                "SELECT * FROM c WHERE c.id = @id",
-                parameters=[{"name": "@id", "value": product_id}],
-                enable_cross_partition_query=True,
-            )
-        )
-        if items:
-            return items[0]
-        raise HTTPException(status_code=404, detail="Product not found")
-    except exceptions.CosmosHttpResponseError:
-        raise HTTPException(status_code=404, detail="Product not found")
+        _, _, _, by_id = await get_cached_products()
+    except exceptions.CosmosHttpResponseError as e:
+        raise_http_error(e)
+
+    # The cached menu already holds the full document, so repeat lookups are
+    # served from memory without a read against Cosmos.
+    body = _product_bodies.get(product_id)
+    if body is None:
+        product = by_id.get(product_id)
+        if product is None:
+            raise HTTPException(status_code=404, detail="Product not found")
+        body = _product_bodies[product_id] = orjson.dumps(product)
+    return Response(content=body, media_type="application/json")
 
 
 @app.get("/api/v1/categories")
-def get_categories():
-    if not products_container:
+async def get_categories():
+    if not cosmos_pool:
         return []
     try:
-        items = list(
-            products_container.query_items(
-                "SELECT DISTINCT c.category FROM c",
-                enable_cross_partition_query=True,
-            )
-        )
-        return [item["category"] for item in items]
-    except Exception:
-        return []
+        _, _, body = await get_cached_categories()
+    except exceptions.CosmosHttpResponseError as e:
+        raise_http_error(e)
+    return Response(content=body, media_type="application/json")
 
 
 @app.get("/api/v1/cart")
-def get_cart(current_user: str = Depends(get_current_user)):
-    if not cart_container or not products_container:
+async def get_cart(current_user: str = Depends(get_current_user)):
+    if not cosmos_pool:
         return []
 
     try:
-        items = list(
-            cart_container.query_items(
-                "SELECT * FROM c WHERE c.user_id = @user_id",
-                parameters=[{"name": "@user_id", "value": DEFAULT_USER}],
-                enable_cross_partition_query=True,
-            )
-        )
+        async with cosmos_pool.get_container("cart") as cart_container:
+            items = []
+            async for item in cart_container.query_items(
+                _Q_CART,
+                parameters=_USER_PARAMS,
+                partition_key=DEFAULT_USER,
+                max_item_count=_CART_PAGE_SIZE,
+            ):
+                items.append(item)
+
+        if not items:
+            return ORJSONResponse(content=[])
+
+        # Product details come from the cached menu, so the cart costs one query.
+        _, _, _, prod_by_id = await get_cached_products()
 
         enriched_cart = []
         for item in items:
-            product_items = list(
-                products_container.query_items(
-                    "SELECT * FROM c WHERE c.id = @pid",
-                    parameters=[{"name": "@pid", "value": item["product_id"]}],
-                    enable_cross_partition_query=True,
-                )
-            )
-            if not product_items:
+            product = prod_by_id.get(item["product_id"])
+            if product is None:
                 continue
 
-            product = product_items[0]
             enriched_cart.append(
                 {
                     "id": product["id"],
@@ -1284,109 +943,192 @@ def get_cart(current_user: str = Depends(get_current_user)):
                 }
             )
 
-        return enriched_cart
+        return ORJSONResponse(content=enriched_cart)
+
+    except exceptions.CosmosHttpResponseError as e:
+        raise_http_error(e)
+
 
-    except Exception as e:
-        return {"error": str(e)}
+def cart_item_id(product_id: str) -> str:
+    """Stable cart document id: one row per (user, product)."""
+    return f"{DEFAULT_USER}:{product_id}"
 
 
 @app.post("/api/v1/cart/items")
-def add_to_cart(item: CartItem, current_user: str = Depends(get_current_user)):
-    if not cart_container:
+async def add_to_cart(item: CartItem, current_user: str = Depends(get_current_user)):
+    if not cosmos_pool:
         return {"error": "Database not available"}
     try:
-        existing = list(
-            cart_container.query_items(
-                "SELECT * FROM c WHERE c.user_id = @user_id AND c.product_id = @product_id",
-                parameters=[
-                    {"name": "@user_id", "value": DEFAULT_USER},
-                    {"name": "@product_id", "value": item.product_id},
-                ],
-                enable_cross_partition_query=True,
+        _, _, _, by_id = await get_cached_products()
+        if item.product_id not in by_id:
+            raise HTTPException(status_code=404, detail="Product not found")
+        async with cosmos_pool.get_container("cart") as cart_container:
+            # the id is derived from the product, so the upsert replaces any
+            # existing row without looking it up first
+            await cart_container.upsert_item(
+                {
+                    "id": cart_item_id(item.product_id),
+                    "user_id": DEFAULT_USER,
+                    "product_id": item.product_id,
+                    "quantity": item.quantity,
+                }
             )
-        )
-        if existing:
-            cart_item = existing[0]
-            cart_item["quantity"] = item.quantity
-            cart_container.upsert_item(cart_item)
-        else:
-            cart_item = {
-                "id": str(uuid.uuid4()),
-                "user_id": DEFAULT_USER,
-                "product_id": item.product_id,
-                "quantity": item.quantity,
-            }
-            cart_container.create_item(cart_item)
-        return {"message": "Saved successfully"}
-    except Exception as e:
-        return {"error": str(e)}
+            return {"message": "Saved successfully"}
+    except exceptions.CosmosHttpResponseError as e:
+        raise_http_error(e)
 
 
 @app.delete("/api/v1/cart/items/{product_id}")
-def remove_from_cart(product_id: str, current_user: str = Depends(get_current_user)):
-    if not cart_container:
+async def remove_from_cart(
+    product_id: Annotated[
+        str, Path(max_length=_PRODUCT_ID_MAX_LENGTH, pattern=_PRODUCT_ID_PATTERN)
+    ],
+    current_user: str = Depends(get_current_user),
+):
+    if not cosmos_pool:
         return {"error": "Database not available"}
     try:
-        items = list(
-            cart_container.query_items(
-                "SELECT * FROM c WHERE c.user_id = @user_id AND c.product_id = @product_id",
-                parameters=[
-                    {"name": "@user_id", "value": DEFAULT_USER},
-                    {"name": "@product_id", "value": product_id},
-                ],
-                enable_cross_partition_query=True,
-            )
-        )
-        for item in items:
-            cart_container.delete_item(item["id"], partition_key=DEFAULT_USER)
-        return {"message": "Removed successfully"}
-    except Exception as e:
-        return {"error": str(e)}
+        async with cosmos_pool.get_container("cart") as cart_container:
+            try:
+                await cart_container.delete_item(
+                    cart_item_id(product_id), partition_key=DEFAULT_USER
+                )
+            except exceptions.CosmosResourceNotFoundError:
+                # Rows written before ids were deterministic may not have been
+                # migrated yet; find them by product instead.
+                legacy_ids = []
+                async for row in cart_container.query_items(
+                    _Q_CART_PRODUCT_IDS,
+                    parameters=[
+                        *_USER_PARAMS,
+                        {"name": "@product_id", "value": product_id},
+                    ],
+                    partition_key=DEFAULT_USER,
+                ):
+                    legacy_ids.append(row["id"])
+                for legacy_id in legacy_ids:
+                    try:
+                        await cart_container.delete_item(
+                            legacy_id, partition_key=DEFAULT_USER
+                        )
+                    except exceptions.CosmosResourceNotFoundError:
+                        pass
+            return {"message": "Removed successfully"}
+    except exceptions.CosmosHttpResponseError as e:
+        raise_http_error(e)
+
+
+# Cosmos caps a transactional batch at 100 operations.
+_BATCH_MAX_OPERATIONS = 100
 
 
 @app.post("/api/v1/orders")
-def create_order(current_user: str = Depends(get_current_user)):
-    if not orders_container or not cart_container:
+async def create_order(current_user: str = Depends(get_current_user)):
+    if not cosmos_pool:
         return {"error": "Database not available"}
     try:
-        cart_items = list(
-            cart_container.query_items(
-                "SELECT * FROM c WHERE c.user_id = @user_id",
-                parameters=[{"name": "@user_id", "value": DEFAULT_USER}],
-                enable_cross_partition_query=True,
-            )
-        )
-        order = {
-            "id": str(uuid.uuid4()),
-            "user_id": DEFAULT_USER,
-            "items": [
-                {"product_id": i["product_id"], "quantity": i["quantity"]}
-                for i in cart_items
-            ],
-            "status": "confirmed",
-            "created_at": datetime.utcnow().isoformat(),
-        }
-        orders_container.create_item(order)
-        for item in cart_items:
-            cart_container.delete_item(item["id"], partition_key=DEFAULT_USER)
-        return order
-    except Exception as e:
-        return {"error": str(e)}
+        async with cosmos_pool.get_containers("cart", "orders") as (
+            cart_container,
+            orders_container,
+        ):
+            # Each page holds at most one batch worth of rows, so pages map
+            # directly onto the transactional deletes below.
+            pages = []
+            async for page in cart_container.query_items(
+                _Q_CART,
+                parameters=_USER_PARAMS,
+                partition_key=DEFAULT_USER,
+                max_item_count=_BATCH_MAX_OPERATIONS,
+            ).by_page():
+                rows = [item async for item in page]
+                if rows:
+                    pages.append(rows)
+            cart_items = [item for rows in pages for item in rows]
+            order = {
+                "id": str(uuid.uuid4()),
+                "user_id": DEFAULT_USER,
+                "items": [
+                    {"product_id": i["product_id"], "quantity": i["quantity"]}
+                    for i in cart_items
+                ],
+                "status": "confirmed",
+                # ISO-8601 UTC strings sort chronologically, which the
+                # newest-first order history relies on
+                "created_at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            }
+            await orders_container.create_item(order)
+
+            # Orders live in their own container, so only the cart deletes can
+            # share a transactional batch.
+            for chunk in pages:
+                try:
+                    await cart_container.execute_item_batch(
+                        batch_operations=[("delete", (i["id"],)) for i in chunk],
+                        partition_key=DEFAULT_USER,
+                    )
+                except exceptions.CosmosBatchOperationError:
+                    # A batch is all-or-nothing (e.g. a row was removed
+                    # concurrently); fall back to deleting row by row.
+                    for i in chunk:
+                        try:
+                            await cart_container.delete_item(
+                                i["id"], partition_key=DEFAULT_USER
+                            )
+                        except exceptions.CosmosResourceNotFoundError:
+                            pass
+            return order
+    except exceptions.CosmosHttpResponseError as e:
+        raise_http_error(e)
+
+
+# Order history is returned newest first, one page per request.
+_ORDERS_PAGE_SIZE = 20
+_ORDERS_MAX_PAGE_SIZE = 100
 
 
 @app.get("/api/v1/orders")
-def get_orders(current_user: str = Depends(get_current_user)):
-    if not orders_container:
-        return []
+async def get_orders(
+    limit: Annotated[int, Query(ge=1, le=_ORDERS_MAX_PAGE_SIZE)] = _ORDERS_PAGE_SIZE,
+    continuation: str | None = None,
+    current_user: str = Depends(get_current_user),
+):
+    """
+    One page of order history. Pass the returned `continuation` back to get the
+    next page; it is null once there are no more orders.
+    """
+    if not cosmos_pool:
+        return {"items": [], "continuation": None}
     try:
-        items = list(
-            orders_container.query_items(
-                "SELECT * FROM c WHERE c.user_id = @user_id",
-                parameters=[{"name": "@user_id", "value": DEFAULT_USER}],
-                enable_cross_partition_query=True,
+        async with cosmos_pool.get_container("orders") as orders_container:
+            # Continuation tokens rather than OFFSET/LIMIT, whose cost grows
+            # with how deep the offset goes.
+            pager = orders_container.query_items(
+                _Q_ORDERS,
+                parameters=_USER_PARAMS,
+                partition_key=DEFAULT_USER,
+                max_item_count=limit,
+            ).by_page(continuation_token=continuation)
+            items = []
+            async for page in pager:
+                async for item in page:
+                    items.append(item)
+                break
+            return ORJSONResponse(
+                content={"items": items, "continuation": pager.continuation_token}
             )
-        )
-        return items
-    except Exception:
-        return []
-
+    except exceptions.CosmosHttpResponseError as e:
+        if continuation and e.status_code == 400:
+            raise HTTPException(status_code=400, detail="Invalid continuation token")
+        raise_http_error(e)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=int(os.environ.get("PORT", "8000")),
+        loop="uvloop",
+        http="httptools",
+    )
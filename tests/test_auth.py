@@ -0,0 +1,59 @@
+"""Parity between the HS256 fast path in decode_access_token and jwt.decode."""
+import os
+import sys
+import time
+
+import jwt
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+SECRET = main._SECRET_BYTES
+FUTURE = int(time.time()) + 3600
+
+
+def _sign(claims, key=SECRET, **kwargs):
+    return jwt.encode(claims, key, algorithm="HS256", **kwargs)
+
+
+def _outcome(decode, token):
+    try:
+        return decode(token)
+    except jwt.InvalidTokenError as e:
+        return type(e)
+
+
+def _tampered(suffix="xx", keep=-2):
+    header, payload, signature = main.create_access_token({"sub": "barista"}).split(".")
+    return f"{header}.{payload[:keep]}{suffix}.{signature}"
+
+
+TOKENS = {
+    "minted": main.create_access_token({"sub": "barista"}),
+    "tampered payload": _tampered(),
+    "wrong key": _sign({"sub": "x", "exp": FUTURE}, key=b"another-secret-another-secret-32"),
+    "expired": _sign({"sub": "x", "exp": int(time.time()) - 5}),
+    "nbf in future": _sign({"sub": "x", "exp": FUTURE, "nbf": FUTURE}),
+    "audience": _sign({"sub": "x", "exp": FUTURE, "aud": "other"}),
+    "iat not a number": _sign({"sub": "x", "exp": FUTURE, "iat": "soon"}),
+    "no sub": _sign({"exp": FUTURE}),
+    "non-string sub": _sign({"sub": 42, "exp": FUTURE}),
+    "no exp": _sign({"sub": "x"}),
+    "string exp": _sign({"sub": "x", "exp": str(FUTURE)}),
+    "extra header": _sign({"sub": "x", "exp": FUTURE}, headers={"kid": "1"}),
+    "junk characters": _tampered(suffix="!!", keep=None),
+    "too many segments": main.create_access_token({"sub": "barista"}) + ".abc",
+    "garbage": "abc",
+}
+
+
+@pytest.mark.parametrize("name", sorted(TOKENS))
+def test_fast_path_matches_jwt_decode(name):
+    token = TOKENS[name]
+    assert _outcome(main.decode_access_token, token) == _outcome(main._decode_with_pyjwt, token)
+
+
+def test_minted_token_is_accepted():
+    assert main.decode_access_token(TOKENS["minted"])["sub"] == "barista"